@@ -1,17 +1,30 @@
+import io
 import os
 import sys
 import uuid
 import json
+import glob
+import asyncio
+import mmap
+import time
+import zlib
+import lzma
 import struct
 import zipfile
 import tarfile
 import tempfile
 import binascii
+import functools
+import mimetypes
 import subprocess
-from flask import Flask, render_template, request, send_file, jsonify
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from quart import Quart, render_template, request, send_file, jsonify, url_for
 from werkzeug.utils import secure_filename
+from storage import get_storage
 
-app = Flask(__name__)
+app = Quart(__name__)
 UPLOAD_FOLDER = "uploads"
 CONVERTED_FOLDER = "converted"
 
@@ -22,40 +35,194 @@ video_exts = ["mp4", "mov", "avi", "webm", "mkv", "flv", "wmv", "mpeg", "mpg", "
 doc_exts = ["pdf", "txt"]
 archive_exts = ["zip", "rar", "tar", "gz", "7z", "bz2", "xz"]
 
+# Declare already-compressed file extensions (stored as-is in generated archives; plain tar is not compressed)
+compressed_exts = ["jpg", "jpeg", "png", "webp", "gif", "ico", "icns", "mp3", "aac", "m4a", "ogg", "opus", "wma", "flac", "alac", "amr", "mka"] + video_exts + [ext for ext in archive_exts if ext != "tar"]
+
+# Declare archive compression presets (zip member compression and gzip level)
+# LZMA zips are smaller but only 7-Zip and similar tools can open them, so it is opt-in
+COMPRESSION_PRESETS = {
+	"fast": {"zip": zipfile.ZIP_DEFLATED, "level": 1},
+	"balanced": {"zip": zipfile.ZIP_DEFLATED, "level": 6},
+	"max": {"zip": zipfile.ZIP_DEFLATED, "level": 9},
+	"lzma": {"zip": zipfile.ZIP_LZMA, "level": 9}
+}
+DEFAULT_COMPRESSION = os.environ.get("UNICONVERTER_COMPRESSION", "balanced")
+PROBE_SIZE = 64 * 1024 # Bytes sampled to decide whether a member is worth compressing
+PROBE_RATIO = 0.9 # Sample must shrink below this ratio to be compressed
+ZIP_WORKERS = os.cpu_count() or 1 # Threads compressing the members of one archive in parallel
+ZIP_CHUNK_SIZE = 1024 * 1024 # Bytes read from a member at a time
+ZIP64_LIMIT = 0xFFFFFFFF # Sizes, offsets and counts from here on need ZIP64 records
+
+# Declare external command settings
+PIPE_CHUNK_SIZE = 64 * 1024 # Bytes read from a child process pipe at a time
+
+# Declare the number of threads per worker for blocking work (Pillow, archives, storage transfers) run off the event loop
+BLOCKING_THREADS = int(os.environ.get("UNICONVERTER_THREADS", 32))
+
+# Declare polyglot extraction settings
+EXTRACT_CHUNK_SIZE = 1024 * 1024 # Bytes copied from the memory-mapped file at a time
+EMBED_MARKER = b"\n--EMBED--" # Separator written before each extra inside the pLTg chunk
+EMBED_USERTYPE = uuid.UUID("b5ff59ad-be44-4157-9f1e-97cb09a62c50").bytes # Usertype of the 'uuid' boxes /merge appends to MP4 files
+
+# Declare in-process audio transcoding settings (same encoders ffmpeg picks by default for each format)
+INPROCESS_AUDIO_CODECS = {
+	"mp3": "libmp3lame",
+	"wav": "pcm_s16le",
+	"flac": "flac",
+	"ogg": "libvorbis",
+	"opus": "libopus",
+	"aac": "aac",
+	"m4a": "aac",
+	"aiff": "pcm_s16be"
+}
+INPROCESS_AUDIO_MAX_SIZE = int(os.environ.get("UNICONVERTER_INPROCESS_AUDIO_MAX_SIZE", 16 * 1024 * 1024)) # 0 disables the in-process path
+INPROCESS_AUDIO_PROBE_SIZE = 32 * 1024 # Bytes libav reads to detect streams (the 5 MB default makes short PCM files slow to open)
+
 # Declare command line argument variable
 is_backup_enabled = False
 
-# Create folders if they don't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-if os.geteuid() == 0:
-	os.chmod(UPLOAD_FOLDER, 0o777)
-os.makedirs(CONVERTED_FOLDER, exist_ok=True)
-if os.geteuid() == 0:
-	os.chmod(CONVERTED_FOLDER, 0o777)
+# Declare download offloading mode ("x-sendfile" for Apache/lighttpd, "x-accel" for nginx)
+SENDFILE_MODE = os.environ.get("UNICONVERTER_SENDFILE", "").lower()
+ACCEL_PREFIX = os.environ.get("UNICONVERTER_ACCEL_PREFIX", "/_converted/")
+
+# Uploads and conversions can be large and slow, so lift Quart's default body size limit and timeouts
+app.config["MAX_CONTENT_LENGTH"] = None
+app.config["BODY_TIMEOUT"] = None
+app.config["RESPONSE_TIMEOUT"] = None
+
+# Select the storage backend (files are keyed as "<folder>/<filename>")
+storage = get_storage()
+
+# Create folders (or cache folders) if they don't exist
+for folder in [UPLOAD_FOLDER, CONVERTED_FOLDER]:
+	folder_path = storage.local_path(folder, fetch=False)
+	os.makedirs(folder_path, exist_ok=True)
+	if os.geteuid() == 0:
+		os.chmod(folder_path, 0o777)
+
+def lease_storage(asgi_app):
+	"""
+	Wrap an ASGI app so the cached files a request uses stay pinned until its response has been sent (or it is cancelled).
+	Args:
+		asgi_app (callable): ASGI application to wrap.
+	"""
+	async def wrapper(scope, receive, send):
+		if scope["type"] != "http":
+			return await asgi_app(scope, receive, send)
+		with storage.lease():
+			await asgi_app(scope, receive, send)
+	return wrapper
+
+app.asgi_app = lease_storage(app.asgi_app)
+
+@app.before_serving
+async def configure_executor():
+	"""
+	Size the thread pool that asyncio.to_thread() hands blocking work to.
+	"""
+	asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=BLOCKING_THREADS))
 
 @app.route('/')
-def index():
+async def index():
 	"""
 	Render the main page of the application.
 	"""
-	return render_template("index.html")
+	return await render_template("index.html")
 
 @app.route("/upload", methods=["POST"])
-def upload():
+async def upload():
 	"""
 	Handle file upload.
 	"""
-	file = request.files["file"]
+	file = (await request.files)["file"]
 	if file:
 		filename = secure_filename(file.filename)
 		ext = os.path.splitext(filename)[1].lower()[1::] # Get the file extension without the dot
-		path = os.path.join(UPLOAD_FOLDER, filename)
-		file.save(path)
+		await asyncio.to_thread(storage.save, os.path.join(UPLOAD_FOLDER, filename), file.stream)
 
 		file_type = detect_type(ext)
 		return {"filename": filename, "type": file_type}
 	return {"error": "No file uploaded"}
 
+async def send_download(path, download_name=None, as_attachment=True, etag=None):
+	"""
+	Send a file with an ETag, conditional GET and HTTP Range support.
+	If offloading is enabled, the byte transfer is handed to the fronting proxy.
+	Args:
+		path (str): Path to the file to send.
+		download_name (str, optional): Filename presented to the client. Defaults to the file's name.
+		as_attachment (bool, optional): Whether to send the file as an attachment. Defaults to True.
+		etag (str, optional): ETag shared by all replicas (see storage.etag()). Defaults to one derived from the local file.
+	"""
+	path = os.path.abspath(path)
+	download_name = download_name or os.path.basename(path)
+
+	# nginx can only serve files from the internal location mapped to the converted folder
+	accel = SENDFILE_MODE == "x-accel" and os.path.dirname(path) == os.path.abspath(storage.local_path(CONVERTED_FOLDER, fetch=False))
+	if SENDFILE_MODE == "x-sendfile" or accel:
+		mimetype = mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+		response = app.response_class(b"", mimetype=mimetype)
+		if accel:
+			response.headers["X-Accel-Redirect"] = ACCEL_PREFIX.rstrip("/") + "/" + quote(os.path.basename(path))
+		else:
+			response.headers["X-Sendfile"] = path
+		if as_attachment:
+			response.headers.set("Content-Disposition", "attachment", filename=download_name)
+		return response
+
+	if etag is None:
+		return await send_file(path, as_attachment=as_attachment, attachment_filename=download_name, conditional=True)
+
+	# Replace the path-based ETag, then evaluate If-None-Match, If-Range and Range against the shared one
+	response = await send_file(path, as_attachment=as_attachment, attachment_filename=download_name)
+	response.set_etag(etag)
+	return await response.make_conditional(request, accept_ranges=True, complete_length=os.path.getsize(path))
+
+@app.route("/download/<filename>", methods=["GET"])
+async def download(filename):
+	"""
+	Download a converted file, so interrupted transfers can be resumed with Range requests.
+	Args:
+		filename (str): Name of the converted file.
+	"""
+	key = os.path.join(CONVERTED_FOLDER, secure_filename(filename))
+	if not await asyncio.to_thread(storage.exists, key):
+		return jsonify({"error": "File does not exist"}), 404
+	return await send_download(await asyncio.to_thread(storage.local_path, key), etag=storage.etag(key))
+
+async def run_command(args, check=False, timeout=None, text=False):
+	"""
+	Run an external command through asyncio, reading its pipes incrementally.
+	The child process is killed if the timeout expires or the caller is cancelled (Quart cancels the request when the client disconnects).
+	Args:
+		args (list): Command and its arguments.
+		check (bool, optional): Raise CalledProcessError on a non-zero exit code. Defaults to False.
+		timeout (float, optional): Seconds before the command is killed. Defaults to None.
+		text (bool, optional): Decode stdout and stderr as UTF-8. Defaults to False.
+	"""
+	proc = await asyncio.create_subprocess_exec(*args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+	stdout, stderr = [], []
+
+	async def drain(stream, chunks):
+		while chunk := await stream.read(PIPE_CHUNK_SIZE):
+			chunks.append(chunk)
+
+	try:
+		await asyncio.wait_for(asyncio.gather(drain(proc.stdout, stdout), drain(proc.stderr, stderr), proc.wait()), timeout)
+	except asyncio.TimeoutError:
+		raise subprocess.TimeoutExpired(args, timeout) from None
+	finally:
+		if proc.returncode is None:
+			proc.kill()
+			await proc.wait()
+
+	out, err = b"".join(stdout), b"".join(stderr)
+	if text:
+		out, err = out.decode("utf-8", "replace"), err.decode("utf-8", "replace")
+	if check and proc.returncode != 0:
+		raise subprocess.CalledProcessError(proc.returncode, args, out, err)
+	return subprocess.CompletedProcess(args, proc.returncode, out, err)
+
 def image_to_colored_svg_kmeans(image_path, output_svg, num_colors=8, min_region_size=100):
 	"""
 	Convert an image to a colored SVG using K-means clustering.
@@ -111,47 +278,401 @@ def image_to_colored_svg_kmeans(image_path, output_svg, num_colors=8, min_region
 
 	dwg.save()
 
-def zip_to_tar(zip_path, tar_path):
+def convert_image(input_path, output_path, target_format):
+	"""
+	Convert an image to another raster format with Pillow.
+	Args:
+		input_path (str): Path to the input image.
+		output_path (str): Path to save the output image.
+		target_format (str): Target image format.
+	"""
+	from PIL import Image
+
+	img = Image.open(input_path)
+
+	# Pillow only knows jpeg, not jpg
+	if target_format == "jpg":
+		target_format = "jpeg"
+	# Pillow only knows tiff, not tif
+	elif target_format == "tif":
+		target_format = "tiff"
+
+	# If target format takes RGB, convert to RGB
+	if target_format in ["jpeg", "eps", "ppm"] and img.mode != "RGB":
+		img = img.convert("RGB")
+	# If target format takes RGBA, convert to RGBA
+	elif target_format in ["png", "webp", "bmp", "ico", "tga", "tiff", "icns"] and img.mode != "RGBA":
+		img = img.convert("RGBA")
+	# If target format takes P, convert to P
+	elif target_format in ["gif"] and img.mode != "P":
+		img = img.convert("P")
+	# If target format takes 1, convert to 1
+	elif target_format in ["xbm"] and img.mode != "1":
+		img = img.convert("1")
+
+	# For ico files, save image with correct size
+	if target_format == "ico":
+		# Ensure the image is square
+		if img.size[0] != img.size[1]:
+			min_size = min(img.size)
+			img = img.resize((min_size, min_size), Image.Resampling.LANCZOS)
+
+		allowed_sizes = [32, 64, 128]
+
+		# Determine the target size based on the original image size
+		max_dim = img.width
+		target_size = max([s for s in allowed_sizes if s <= max_dim], default=min(allowed_sizes))
+		img = img.resize((target_size, target_size), Image.Resampling.LANCZOS)
+
+		# Save the image as ICO
+		img.save(output_path, format=target_format.upper(), sizes=[(target_size, target_size)])
+
+	# Save the image in the target format
+	if not target_format in ["ico", "svg", "heic"]:
+		img.save(output_path, target_format.upper())
+
+def get_compression_preset(name=None):
+	"""
+	Get an archive compression preset, falling back to the default preset.
+	Args:
+		name (str, optional): Preset name ("fast", "balanced", "max" or "lzma"). Defaults to UNICONVERTER_COMPRESSION.
+	"""
+	return COMPRESSION_PRESETS.get(name or DEFAULT_COMPRESSION, COMPRESSION_PRESETS["balanced"])
+
+def is_compressible(arcname, sample):
+	"""
+	Check whether an archive member is worth compressing.
+	Args:
+		arcname (str): Name of the member inside the archive.
+		sample (bytes): Leading bytes of the member.
+	"""
+	ext = os.path.splitext(arcname)[1].lower()[1::]
+	if ext in compressed_exts or not sample:
+		return False
+	# Probe with the cheapest deflate level; incompressible data barely shrinks
+	return len(zlib.compress(sample, 1)) < len(sample) * PROBE_RATIO
+
+def zip_dos_time(timestamp):
+	"""
+	Pack a timestamp into MS-DOS (time, date) fields, clamped to the 1980-2107 range zip supports.
+	Args:
+		timestamp (float): Seconds since the epoch.
+	"""
+	t = time.localtime(timestamp)
+	if t.tm_year < 1980:
+		return 0, (1 << 5) | 1 # 1980-01-01 00:00
+	year = min(t.tm_year, 2107)
+	return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+def make_zip_compressor(method, level):
+	"""
+	Create a raw compressor for a zip member and the bytes its data must start with.
+	Args:
+		method (int): zipfile.ZIP_DEFLATED or zipfile.ZIP_LZMA.
+		level (int): Compression level (0-9).
+	"""
+	if method == zipfile.ZIP_LZMA:
+		# LZMA members start with the LZMA SDK version (9.20), the properties size and the LZMA1 properties:
+		# lc/lp/pb packed as (pb * 5 + lp) * 9 + lc, then the dictionary size
+		dict_size = 1 << 23
+		compressor = lzma.LZMACompressor(lzma.FORMAT_RAW, filters=[{"id": lzma.FILTER_LZMA1, "preset": level, "dict_size": dict_size, "lc": 3, "lp": 0, "pb": 2}])
+		props = struct.pack("<BI", (2 * 5 + 0) * 9 + 3, dict_size)
+		return compressor, struct.pack("<BBH", 9, 20, len(props)) + props
+	return zlib.compressobj(level, zlib.DEFLATED, -15), b""
+
+def iter_zip_source(source):
+	"""
+	Yield a zip member's data in chunks.
+	Args:
+		source (str|bytes): Path on disk or bytes.
+	"""
+	if isinstance(source, bytes):
+		for offset in range(0, len(source), ZIP_CHUNK_SIZE):
+			yield source[offset:offset + ZIP_CHUNK_SIZE]
+		return
+	with open(source, "rb") as f:
+		while chunk := f.read(ZIP_CHUNK_SIZE):
+			yield chunk
+
+def prepare_zip_member(arcname, source, preset):
+	"""
+	Checksum and compress a zip member if it is worth it (runs in a worker thread).
+	Stored members on disk are left for write_zip_member() to stream.
+	Args:
+		arcname (str): Name of the member inside the archive.
+		source (str|bytes): Path on disk or bytes.
+		preset (dict): Compression preset.
+	"""
+	if isinstance(source, bytes):
+		sample = source[:PROBE_SIZE]
+		member = {"file_size": len(source), "date_time": time.time(), "external_attr": 0o600 << 16}
+	else:
+		stat = os.stat(source)
+		with open(source, "rb") as f:
+			sample = f.read(PROBE_SIZE)
+		member = {"file_size": stat.st_size, "date_time": stat.st_mtime, "external_attr": (stat.st_mode & 0xFFFF) << 16}
+	member.update(arcname=arcname, source=source, method=zipfile.ZIP_STORED, crc=0, compress_size=member["file_size"], chunks=None)
+
+	if is_compressible(arcname, sample):
+		compressor, header = make_zip_compressor(preset["zip"], preset["level"])
+		chunks, crc, file_size = [header], 0, 0
+		for chunk in iter_zip_source(source):
+			crc = zlib.crc32(chunk, crc)
+			file_size += len(chunk)
+			chunks.append(compressor.compress(chunk))
+		chunks.append(compressor.flush())
+		member.update(method=preset["zip"], crc=crc, file_size=file_size, compress_size=sum(map(len, chunks)), chunks=chunks)
+	elif isinstance(source, bytes):
+		member.update(crc=zlib.crc32(source), chunks=[source])
+	return member
+
+def write_zip_member(f, member):
+	"""
+	Write a prepared member's local header and data, and return its central directory record.
+	Args:
+		f (file): Output zip file, positioned at the end.
+		member (dict): Member as returned by prepare_zip_member().
+	"""
+	offset = f.tell()
+	name = member["arcname"].encode("utf-8")
+	flags = 0 if member["arcname"].isascii() else 0x800 # UTF-8 name
+	if member["method"] == zipfile.ZIP_LZMA:
+		flags |= 0x02 # LZMA data ends with an end-of-stream marker
+	dos_time, dos_date = zip_dos_time(member["date_time"])
+
+	# Local header: signature, version, flags, method, time, date, crc, sizes, name and extra lengths
+	zip64 = max(member["file_size"], member["compress_size"]) >= ZIP64_LIMIT
+	extra = struct.pack("<2H2Q", 1, 16, member["file_size"], member["compress_size"]) if zip64 else b""
+	sizes = (0xFFFFFFFF, 0xFFFFFFFF) if zip64 else (member["compress_size"], member["file_size"])
+	version = 63 if member["method"] == zipfile.ZIP_LZMA else 45 if zip64 else 20
+	f.write(struct.pack("<4s5H3L2H", b"PK\x03\x04", version, flags, member["method"], dos_time, dos_date, member["crc"], *sizes, len(name), len(extra)) + name + extra)
+
+	if member["chunks"] is None:
+		# Stream stored files from disk and fill in the CRC afterwards
+		crc = 0
+		for chunk in iter_zip_source(member["source"]):
+			crc = zlib.crc32(chunk, crc)
+			f.write(chunk)
+		member["crc"] = crc
+		end = f.tell()
+		f.seek(offset + 14) # signature(4) + version(2) + flags(2) + method(2) + time(2) + date(2)
+		f.write(struct.pack("<L", crc))
+		f.seek(end)
+	else:
+		for chunk in member["chunks"]:
+			f.write(chunk)
+
+	# Central directory record: sizes and offset that do not fit go into a ZIP64 extra field, in this order
+	large = [value for value in (member["file_size"], member["compress_size"], offset) if value >= ZIP64_LIMIT]
+	extra = struct.pack(f"<2H{len(large)}Q", 1, 8 * len(large), *large) if large else b""
+	version = 63 if member["method"] == zipfile.ZIP_LZMA else 45 if large else 20
+	sizes = [0xFFFFFFFF if value >= ZIP64_LIMIT else value for value in (member["compress_size"], member["file_size"], offset)]
+	return struct.pack("<4s4B4HL2L5H2L", b"PK\x01\x02", version, 3, version, 0, flags, member["method"], dos_time, dos_date, member["crc"], sizes[0], sizes[1], len(name), len(extra), 0, 0, 0, member["external_attr"], sizes[2]) + name + extra
+
+def write_zip_end(f, records):
+	"""
+	Write the central directory and end of central directory records (with ZIP64 records if needed).
+	Args:
+		f (file): Output zip file, positioned after the last member.
+		records (list): Central directory records returned by write_zip_member().
+	"""
+	cd_offset = f.tell()
+	for record in records:
+		f.write(record)
+	cd_size = f.tell() - cd_offset
+
+	if len(records) >= 0xFFFF or cd_size >= ZIP64_LIMIT or cd_offset >= ZIP64_LIMIT:
+		zip64_offset = f.tell()
+		f.write(struct.pack("<4sQ2H2L4Q", b"PK\x06\x06", 44, 45, 45, 0, 0, len(records), len(records), cd_size, cd_offset))
+		f.write(struct.pack("<4sLQL", b"PK\x06\x07", 0, zip64_offset, 1))
+	count = min(len(records), 0xFFFF)
+	f.write(struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, count, count, min(cd_size, 0xFFFFFFFF), min(cd_offset, 0xFFFFFFFF), 0))
+
+def write_zip(zip_path, members, compression=None):
+	"""
+	Write a zip archive in member order, storing already-compressed members and compressing the rest in parallel.
+	Members are compressed by a thread pool (zlib and lzma release the GIL) and written in order as they finish,
+	with at most 2 * ZIP_WORKERS prepared members held in memory.
+	Args:
+		zip_path (str): Path to save the output zip file.
+		members (list): List of tuples (arcname, path on disk or bytes).
+		compression (str, optional): Compression preset name. Defaults to UNICONVERTER_COMPRESSION.
+	"""
+	preset = get_compression_preset(compression)
+	records = []
+	with ThreadPoolExecutor(max_workers=ZIP_WORKERS) as pool, open(zip_path, "wb") as f:
+		pending = deque()
+		for arcname, source in members:
+			pending.append(pool.submit(prepare_zip_member, arcname, source, preset))
+			if len(pending) >= 2 * ZIP_WORKERS:
+				records.append(write_zip_member(f, pending.popleft().result()))
+		while pending:
+			records.append(write_zip_member(f, pending.popleft().result()))
+		write_zip_end(f, records)
+
+def zip_to_tar(zip_path, tar_path, compression=None):
 	"""
 	Convert a zip archive to a tar.gz archive.
 	Args:
 		zip_path (str): Path to the input zip file.
 		tar_path (str): Path to save the output tar.gz file.
+		compression (str, optional): Compression preset name. Defaults to UNICONVERTER_COMPRESSION.
 	"""
 	with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+		# Only spend CPU on gzip if a meaningful share of the data is compressible
+		total_size = 0
+		compressible_size = 0
+		for info in zip_ref.infolist():
+			if info.is_dir():
+				continue
+			total_size += info.file_size
+			with zip_ref.open(info) as member:
+				if is_compressible(info.filename, member.read(PROBE_SIZE)):
+					compressible_size += info.file_size
+		level = get_compression_preset(compression)["level"]
+		if compressible_size < total_size * (1 - PROBE_RATIO):
+			level = 0
+
 		with tempfile.TemporaryDirectory() as temp_dir:
 			zip_ref.extractall(temp_dir)
 
-			with tarfile.open(tar_path, 'w:gz') as tar:
+			with tarfile.open(tar_path, 'w:gz', compresslevel=level) as tar:
 				tar.add(temp_dir, arcname='.')
 
-def sevenz_to_zip(sevenz_path, zip_path):
+def tar_to_zip(tar_path, zip_path, compression=None):
+	"""
+	Convert a tar (or tar.gz) archive to a zip archive.
+	Args:
+		tar_path (str): Path to the input tar file.
+		zip_path (str): Path to save the output zip file.
+		compression (str, optional): Compression preset name. Defaults to UNICONVERTER_COMPRESSION.
+	"""
+	with tarfile.open(tar_path, 'r') as tar:
+		members = []
+		for member in tar.getmembers():
+			if member.isfile():
+				file_data = tar.extractfile(member).read()
+				members.append((member.name, file_data))
+		write_zip(zip_path, members, compression)
+
+def sevenz_to_zip(sevenz_path, zip_path, compression=None):
 	import py7zr
 	"""
 	Convert a 7z archive to a zip archive.
 	Args:
 		sevenz_path (str): Path to the input 7z file.
 		zip_path (str): Path to save the output zip file.
+		compression (str, optional): Compression preset name. Defaults to UNICONVERTER_COMPRESSION.
 	"""
 	with py7zr.SevenZipFile(sevenz_path, mode='r') as archive:
-		with zipfile.ZipFile(zip_path, 'w') as zipf:
-			for file in archive.getnames():
-				data = archive.read(file)
-				zipf.writestr(file, data)
+		members = []
+		for file in archive.getnames():
+			data = archive.read(file)
+			members.append((file, data))
+		write_zip(zip_path, members, compression)
+
+def pdf_to_txt(pdf_path, txt_path):
+	"""
+	Extract the text of a PDF file with pdfminer.
+	Args:
+		pdf_path (str): Path to the input PDF file.
+		txt_path (str): Path to save the output text file.
+	"""
+	from pdfminer.high_level import extract_text
+	text = extract_text(pdf_path)
+	with open(txt_path, 'w', encoding="utf-8") as f:
+		f.write(text)
+
+def txt_to_pdf(txt_path, pdf_path):
+	"""
+	Render a text file to a PDF file with FPDF, one line per cell.
+	Args:
+		txt_path (str): Path to the input text file.
+		pdf_path (str): Path to save the output PDF file.
+	"""
+	from fpdf import FPDF
+	pdf = FPDF()
+	pdf.add_page()
+	pdf.set_font("Arial", size=12)
+	with open(txt_path, 'r', encoding="utf-8") as f:
+		for line in f:
+			pdf.cell(200, 10, txt=line, ln=True)
+	pdf.output(pdf_path)
+
+@functools.lru_cache(maxsize=None)
+def get_audio_encoder(codec_name):
+	"""
+	Look up (and cache) a libav audio encoder and its supported sample rates and formats.
+	Args:
+		codec_name (str): Encoder name (e.g., "libmp3lame").
+	"""
+	import av
+	codec = av.codec.Codec(codec_name, "w")
+	rates = list(codec.audio_rates or [])
+	formats = [f.name for f in (codec.audio_formats or [])]
+	return rates, formats
 
-def convert_one(file):
+def use_inprocess_audio(input_path, target_format):
+	"""
+	Check whether an audio file should be transcoded in-process instead of by an ffmpeg subprocess.
+	Small files are dominated by process start-up cost, so only they take the in-process path.
+	Args:
+		input_path (str): Path to the input audio file.
+		target_format (str): Target audio format.
+	"""
+	return target_format in INPROCESS_AUDIO_CODECS and os.path.getsize(input_path) <= INPROCESS_AUDIO_MAX_SIZE
+
+def transcode_audio(input_path, output_path, target_format):
+	"""
+	Transcode the first audio stream of a file in-process with PyAV (libav bindings).
+	Args:
+		input_path (str): Path to the input audio file.
+		output_path (str): Path to save the output audio file.
+		target_format (str): Target audio format.
+	"""
+	import av
+	codec_name = INPROCESS_AUDIO_CODECS[target_format]
+	rates, formats = get_audio_encoder(codec_name)
+
+	with av.open(input_path, container_options={"probesize": str(INPROCESS_AUDIO_PROBE_SIZE)}) as src, av.open(output_path, "w") as dst:
+		in_stream = src.streams.audio[0]
+		# Keep the input rate, format and channels when the encoder supports them
+		rate = in_stream.rate if not rates or in_stream.rate in rates else max(rates)
+		sample_format = in_stream.format.name if not formats or in_stream.format.name in formats else formats[0]
+		layout = {1: "mono", 2: "stereo"}.get(in_stream.layout.nb_channels, in_stream.layout.name)
+
+		out_stream = dst.add_stream(codec_name, rate=rate)
+		out_stream.layout = layout
+		out_stream.format = sample_format
+
+		# Keep global and stream tags, as ffmpeg does by default (must be set before the header is written)
+		dst.metadata.update(src.metadata)
+		out_stream.metadata.update(in_stream.metadata)
+
+		# Resample into frames of the size the encoder expects (0 means any size)
+		resampler = av.AudioResampler(format=sample_format, layout=layout, rate=rate, frame_size=out_stream.codec_context.frame_size or None)
+		for frame in src.decode(in_stream):
+			for resampled in resampler.resample(frame):
+				dst.mux(out_stream.encode(resampled))
+		for resampled in resampler.resample(None):
+			dst.mux(out_stream.encode(resampled))
+		dst.mux(out_stream.encode(None))
+
+async def convert_one(file):
 	"""
 	Convert a single file.
 	Args:
-		file (dict): A dictionary containing the filename and target format.
+		file (dict): A dictionary containing the filename, target format and optional compression preset.
 	"""
 	filename = file["filename"]
 	ext = os.path.splitext(filename)[1].lower()[1::] # Get the file extension without the dot
 	target_format = file["target_format"]
-	input_path = os.path.join(UPLOAD_FOLDER, filename)
+	compression = file.get("compression")
+	input_path = await asyncio.to_thread(storage.local_path, os.path.join(UPLOAD_FOLDER, filename))
 	base = uuid.uuid4().hex
 	output_filename = f"{base}.{target_format}"
-	output_path = os.path.join(CONVERTED_FOLDER, output_filename)
+	output_key = os.path.join(CONVERTED_FOLDER, output_filename)
+	output_path = storage.local_path(output_key, fetch=False)
 
 	# If asking to convert to the same format, just return the original file
 	if ext == target_format:
@@ -159,77 +680,45 @@ def convert_one(file):
 
 	if ext in image_exts and target_format in image_exts:
 		try:
-			from PIL import Image
-
 			# For SVG, we need to vectorize the image
 			if target_format == "svg":
 				try:
-					image_to_colored_svg_kmeans(input_path, output_path)
+					await asyncio.to_thread(image_to_colored_svg_kmeans, input_path, output_path)
 				except ImportError as e:
 					print("Import errors: cv2, numpy, or svgwrite module not found")
 					print("Error details:", e)
 					return jsonify({"error": "Required libraries for SVG conversion are not installed."}), 500
-
-			img = Image.open(input_path)
-
-			# Pillow only knows jpeg, not jpg
-			if target_format == "jpg":
-				target_format = "jpeg"
-			# Pillow only knows tiff, not tif
-			elif target_format == "tif":
-				target_format = "tiff"
-
-			# If target format takes RGB, convert to RGB
-			if target_format in ["jpeg", "eps", "ppm"] and img.mode != "RGB":
-				img = img.convert("RGB")
-			# If target format takes RGBA, convert to RGBA
-			elif target_format in ["png", "webp", "bmp", "ico", "tga", "tiff", "icns"] and img.mode != "RGBA":
-				img = img.convert("RGBA")
-			# If target format takes P, convert to P
-			elif target_format in ["gif"] and img.mode != "P":
-				img = img.convert("P")
-			# If target format takes 1, convert to 1
-			elif target_format in ["xbm"] and img.mode != "1":
-				img = img.convert("1")
-
-			# For ico files, save image with correct size
-			if target_format == "ico":
-				# Ensure the image is square
-				if img.size[0] != img.size[1]:
-					min_size = min(img.size)
-					img = img.resize((min_size, min_size), Image.Resampling.LANCZOS)
-
-				allowed_sizes = [32, 64, 128]
-
-				# Determine the target size based on the original image size
-				max_dim = img.width
-				target_size = max([s for s in allowed_sizes if s <= max_dim], default=min(allowed_sizes))
-				img = img.resize((target_size, target_size), Image.Resampling.LANCZOS)
-
-				# Save the image as ICO
-				img.save(output_path, format=target_format.upper(), sizes=[(target_size, target_size)])
-
-			# Save the image in the target format
-			if not target_format in ["ico", "svg", "heic"]:
-				img.save(output_path, target_format.upper())
+			else:
+				# Pillow holds the thread while it decodes and encodes, so keep it off the event loop
+				await asyncio.to_thread(convert_image, input_path, output_path, target_format)
 		except ImportError as e:
 			print("Pillow error: PIL module not found")
 			print("Error details:", e)
 			return jsonify({"error": "Pillow is required for image conversion."}), 500
 
 	elif (ext in audio_exts and target_format in audio_exts) or (ext in video_exts and target_format in audio_exts):
-		args = ["ffmpeg", "-y", "-i", input_path, "-vn", output_path]
+		# Transcode small audio files in-process, falling back to ffmpeg
+		transcoded = False
+		if ext in audio_exts and use_inprocess_audio(input_path, target_format):
+			try:
+				await asyncio.to_thread(transcode_audio, input_path, output_path, target_format)
+				transcoded = True
+			except Exception as e:
+				print("PyAV error (falling back to FFmpeg):", e)
+
+		if not transcoded:
+			args = ["ffmpeg", "-y", "-i", input_path, "-vn", output_path]
 
-		out = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-		if out.returncode != 0:
-			print("FFmpeg error:", out.stderr)
-			return jsonify({"error": "Audio conversion failed."}), 500
+			out = await run_command(args, text=True)
+			if out.returncode != 0:
+				print("FFmpeg error:", out.stderr)
+				return jsonify({"error": "Audio conversion failed."}), 500
 
 	elif ext in audio_exts and target_format in video_exts:
 		args = ["ffmpeg", "-y", "-i", input_path, "-c:a", "aac", output_path]
 
 		try:
-			subprocess.run(args, check=True)
+			await run_command(args, check=True)
 		except subprocess.CalledProcessError as e:
 			print("FFmpeg error:", e)
 			return jsonify({"error": "Audio to video conversion failed."}), 500
@@ -238,7 +727,7 @@ def convert_one(file):
 		args = ["ffmpeg", "-y", "-i", input_path, output_path]
 
 		try:
-			subprocess.run(args, check=True)
+			await run_command(args, check=True)
 		except subprocess.CalledProcessError as e:
 			print("FFmpeg error:", e)
 			return jsonify({"error": "Video conversion failed."}), 500
@@ -247,7 +736,7 @@ def convert_one(file):
 		args = ["ffmpeg", "-y", "-i", input_path, "-frames:v", "1", output_path]
 
 		try:
-			subprocess.run(args, check=True)
+			await run_command(args, check=True)
 		except subprocess.CalledProcessError as e:
 			print("FFmpeg error:", e)
 			return jsonify({"error": "Video to image conversion failed."}), 500
@@ -255,24 +744,14 @@ def convert_one(file):
 	elif ext in doc_exts and target_format in doc_exts:
 		if ext == "pdf" and target_format == "txt":
 			try:
-				from pdfminer.high_level import extract_text
-				text = extract_text(input_path)
-				with open(output_path, 'w', encoding="utf-8") as f:
-					f.write(text)
+				await asyncio.to_thread(pdf_to_txt, input_path, output_path)
 			except ImportError as e:
 				print("PDFMiner error: pdfminer.six module not found")
 				print("Error details:", e)
 				return jsonify({"error": "pdfminer.six is required for PDF to TXT conversion."}), 500
 		elif ext == "txt" and target_format == "pdf":
 			try:
-				from fpdf import FPDF
-				pdf = FPDF()
-				pdf.add_page()
-				pdf.set_font("Arial", size=12)
-				with open(input_path, 'r', encoding="utf-8") as f:
-					for line in f:
-						pdf.cell(200, 10, txt=line, ln=True)
-				pdf.output(output_path)
+				await asyncio.to_thread(txt_to_pdf, input_path, output_path)
 			except ImportError as e:
 				print("FPDF error: fpdf module not found")
 				print("Error details:", e)
@@ -281,66 +760,65 @@ def convert_one(file):
 			return jsonify({"error": "Unsupported document conversion"}), 400
 
 	elif ext == "pdf" and target_format in image_exts:
+		# Render the pages with pdftoppm (poppler) as <base>-<page>.png, so it is killed if the client disconnects
+		prefix = storage.local_path(os.path.join(UPLOAD_FOLDER, base), fetch=False)
 		try:
-			from pdf2image import convert_from_path
-			pages = convert_from_path(input_path)
-			for i, page in enumerate(pages):
+			await run_command(["pdftoppm", "-r", "200", "-png", input_path, prefix], check=True)
+		except subprocess.CalledProcessError as e:
+			print("pdftoppm error:", e.stderr)
+			return jsonify({"error": "PDF to image conversion failed."}), 500
+
+		# pdftoppm pads page numbers to the width of the page count, so sort them numerically
+		pages = sorted(glob.glob(glob.escape(prefix) + "-*.png"), key=lambda p: int(p[len(prefix) + 1:-len(".png")]))
+		for i, page_path in enumerate(pages):
+			os.rename(page_path, storage.local_path(os.path.join(UPLOAD_FOLDER, f"{base}_{i + 1}.png"), fetch=False))
+		# Convert the pages to the target format using convert one
+		tmp_filenames = []
+		if target_format != "png":
+			for i in range(len(pages)):
 				page_output_filename = f"{base}_{i + 1}.png"
-				page_output_path = os.path.join(UPLOAD_FOLDER, page_output_filename)
-				page.save(page_output_path, "PNG")
-			# Convert the pages to the target format using convert one
-			tmp_filenames = []
-			if target_format != "png":
-				for i, page in enumerate(pages):
-					page_output_filename = f"{base}_{i + 1}.png"
-					tmp_filenames.append(convert_one({"filename": page_output_filename, "target_format": target_format}))
-			# Zip all of the files into a single file
-			if len(tmp_filenames) > 1:
-				zip_filename = f"{base}_pages.zip"
-				zip_path = os.path.join(CONVERTED_FOLDER, zip_filename)
-				with zipfile.ZipFile(zip_path, 'w') as zipf:
-					for i in tmp_filenames:
-						zipf.write(os.path.join(CONVERTED_FOLDER, i), arcname=i)
-				return zip_filename
-			else:
-				os.rename(os.path.join(UPLOAD_FOLDER, f"{base}_1.png"), os.path.join(CONVERTED_FOLDER, output_filename))
-				return output_filename
-		except ImportError as e:
-			print("PDF2Image error: pdf2image module not found")
-			print("Error details:", e)
-			return jsonify({"error": "pdf2image is required for PDF to image conversion."}), 500
+				tmp_filenames.append(await convert_one({"filename": page_output_filename, "target_format": target_format}))
+		# Zip all of the files into a single file
+		if len(tmp_filenames) > 1:
+			zip_filename = f"{base}_pages.zip"
+			zip_key = os.path.join(CONVERTED_FOLDER, zip_filename)
+			members = [(i, await asyncio.to_thread(storage.local_path, os.path.join(CONVERTED_FOLDER, i))) for i in tmp_filenames]
+			await asyncio.to_thread(write_zip, storage.local_path(zip_key, fetch=False), members, compression)
+			await asyncio.to_thread(storage.commit, zip_key)
+			return zip_filename
+		else:
+			os.rename(storage.local_path(os.path.join(UPLOAD_FOLDER, f"{base}_1.png"), fetch=False), output_path)
+			await asyncio.to_thread(storage.commit, output_key)
+			return output_filename
 
 	elif ext in archive_exts and target_format in archive_exts:
+		# Archive work is CPU and disk bound, so run it in a worker thread
 		if ext == "zip" and target_format == "gz":
-			zip_to_tar(input_path, output_path)
+			await asyncio.to_thread(zip_to_tar, input_path, output_path, compression)
 		elif ext == "7z" and target_format == "zip":
-			sevenz_to_zip(input_path, output_path)
+			await asyncio.to_thread(sevenz_to_zip, input_path, output_path, compression)
 		elif ext == "gz" and target_format == "zip":
-			with tarfile.open(input_path, 'r') as tar:
-				with zipfile.ZipFile(output_path, 'w') as zipf:
-					for member in tar.getmembers():
-						if member.isfile():
-							file_data = tar.extractfile(member).read()
-							zipf.writestr(member.name, file_data)
+			await asyncio.to_thread(tar_to_zip, input_path, output_path, compression)
 		elif ext == "gz" and target_format == "zip":
-			with open(input_path, "rb") as gz_file:
-				with zipfile.ZipFile(output_path, 'w') as zipf:
-					zipf.writestr(os.path.basename(input_path), gz_file.read())
+			await asyncio.to_thread(write_zip, output_path, [(os.path.basename(input_path), input_path)], compression)
 		else:
 			return {"error": "Unsupported archive conversion"}
 
 	else:
 		return {"error": "Unsupported conversion"}
 
+	await asyncio.to_thread(storage.commit, output_key)
 	return output_filename
 
 @app.route("/convert", methods=["POST"])
-def convert():
+async def convert():
 	"""
 	Convert uploaded files to the target format.
 	"""
-	files = request.files.getlist("files")
-	target_format = request.form.get("target_format")
+	files = (await request.files).getlist("files")
+	form = await request.form
+	target_format = form.get("target_format")
+	compression = form.get("compression")
 	if not files or not target_format:
 		return jsonify({"error": "No files or target format specified"}), 400
 
@@ -349,23 +827,26 @@ def convert():
 	for file in files:
 		if file:
 			filename = secure_filename(file.filename)
-			path = os.path.join(UPLOAD_FOLDER, filename)
-			file.save(path)
-			file_info = {"filename": filename, "target_format": target_format}
-			result = convert_one(file_info)
+			await asyncio.to_thread(storage.save, os.path.join(UPLOAD_FOLDER, filename), file.stream)
+			file_info = {"filename": filename, "target_format": target_format, "compression": compression}
+			result = await convert_one(file_info)
 			converted_files.append(result)
 
 	# Zip converted files if more than one
 	if len(converted_files) > 1:
 		zip_filename = f"converted_{uuid.uuid4().hex}.zip"
-		zip_path = os.path.join(CONVERTED_FOLDER, zip_filename)
-		with zipfile.ZipFile(zip_path, 'w') as zipf:
-			for converted_file in converted_files:
-				file_path = os.path.join(CONVERTED_FOLDER, converted_file)
-				zipf.write(file_path, arcname=converted_file)
-		return send_file(zip_path, as_attachment=True)
+		zip_key = os.path.join(CONVERTED_FOLDER, zip_filename)
+		members = [(converted_file, await asyncio.to_thread(storage.local_path, os.path.join(CONVERTED_FOLDER, converted_file))) for converted_file in converted_files]
+		await asyncio.to_thread(write_zip, storage.local_path(zip_key, fetch=False), members, compression)
+		await asyncio.to_thread(storage.commit, zip_key)
 	else:
-		return send_file(os.path.join(CONVERTED_FOLDER, converted_files[0]), as_attachment=True)
+		zip_filename = converted_files[0]
+
+	# Point the client at a resumable GET URL for the same file
+	zip_key = os.path.join(CONVERTED_FOLDER, zip_filename)
+	response = await send_download(await asyncio.to_thread(storage.local_path, zip_key), etag=storage.etag(zip_key))
+	response.headers["Content-Location"] = url_for("download", filename=zip_filename)
+	return response
 
 PRIORITY = {
 	"video": 1,
@@ -438,7 +919,7 @@ def append_mp4_box_bytes(base_bytes, box_type, payload, usertype = None):
 		total_size = header_size + len(payload)
 		return base_bytes + struct.pack(">I", total_size) + box_type + payload
 
-def verify_mp4(path):
+async def verify_mp4(path):
 	"""
 	Use ffprobe to quickly check basic mp4 readability.
 	Args:
@@ -446,18 +927,20 @@ def verify_mp4(path):
 	"""
 	try:
 		cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", path]
-		res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=8)
+		res = await run_command(cmd, timeout=8)
 		return res.returncode == 0 and res.stdout.strip() != b""
-	except Exception:
+	except (OSError, subprocess.TimeoutExpired):
+		# Missing ffprobe or a hung probe; cancellation (client disconnect) propagates to the caller
 		return False
 
-def extract_pdf_bytes(blob):
+def find_pdf_region(blob):
 	"""
-	Find a %PDF- ... %%EOF region inside blob and return bytes or None.
+	Find a %PDF- ... %%EOF region inside blob and return its (start, end) offsets or None.
 	Args:
-		blob (bytes): The binary data to search for PDF content.
+		blob (bytes|mmap.mmap): The binary data to search for PDF content.
 	"""
-	start = blob.find(b"%PDF-")
+	# Explicit offsets: mmap searches start at the current file position by default
+	start = blob.find(b"%PDF-", 0)
 	if start == -1:
 		return None
 	# Find last %%EOF after start
@@ -467,18 +950,18 @@ def extract_pdf_bytes(blob):
 	# Include %%EOF (and possibly following newline)
 	end = eof_idx + len(b"%%EOF")
 	# If there are multiple EOFs, prefer the last one after start:
-	idx = blob.rfind(b"%%EOF")
+	idx = blob.rfind(b"%%EOF", start)
 	if idx >= start:
 		end = idx + len(b"%%EOF")
-	return blob[start:end]
+	return start, end
 
-def extract_png_bytes(blob):
+def find_png_region(blob):
 	"""
-	Find a PNG ... IEND region inside blob and return bytes or None.
+	Find a PNG ... IEND region inside blob and return its (start, end) offsets or None.
 	Args:
-		blob (bytes): The binary data to search for PNG content.
+		blob (bytes|mmap.mmap): The binary data to search for PNG content.
 	"""
-	start = blob.find(PNG_SIG)
+	start = blob.find(PNG_SIG, 0)
 	if start == -1:
 		return None
 	# Find IEND
@@ -489,15 +972,15 @@ def extract_png_bytes(blob):
 	# Grab until IEND + CRC(4)
 	end = iend_idx + 4 + 4 + 4 # Length(4)=0 + "IEND"(4) + CRC(4)
 	# Safer: find the CRC 4 bytes after the IEND sequence
-	return blob[start:end]
+	return start, end
 
-def merge_with_mp4_base(base_path, extras, merged_path):
+def append_mp4_extras(base_path, extras, merged_path):
 	"""
-	Merge extras into an MP4 base file by appending them as 'uuid' boxes.
+	Write an MP4 base file with extras appended as 'uuid' boxes (so mp4 players ignore them).
 	Args:
 		base_path (str): MP4 path.
 		extras (list): List of tuples (filename_on_disk, mime_type/extension).
-		strategy (str): Append each extra as a uuid box (so mp4 players ignore it).
+		merged_path (str): Output path for the merged MP4.
 	"""
 	with open(base_path, "rb") as f:
 		base_bytes = f.read()
@@ -505,14 +988,24 @@ def merge_with_mp4_base(base_path, extras, merged_path):
 	for (extra_path, ext) in extras:
 		with open(extra_path, "rb") as ef:
 			payload = ef.read()
-		# Use "uuid" box so the data is a valid top-level atom
-		base_bytes = append_mp4_box_bytes(base_bytes, b"uuid", payload)
+		# Use "uuid" box so the data is a valid top-level atom, tagged so /extract can tell it from other uuid boxes
+		base_bytes = append_mp4_box_bytes(base_bytes, b"uuid", payload, EMBED_USERTYPE)
 
 	with open(merged_path, "wb") as out:
 		out.write(base_bytes)
 
+async def merge_with_mp4_base(base_path, extras, merged_path):
+	"""
+	Merge extras into an MP4 base file by appending them as 'uuid' boxes.
+	Args:
+		base_path (str): MP4 path.
+		extras (list): List of tuples (filename_on_disk, mime_type/extension).
+		merged_path (str): Output path for the merged MP4.
+	"""
+	await asyncio.to_thread(append_mp4_extras, base_path, extras, merged_path)
+
 	# Verify mp4 is still readable
-	if not verify_mp4(merged_path):
+	if not await verify_mp4(merged_path):
 		return False, "ffprobe failed; appended atoms probably broke the mp4 structure."
 
 	return True, "OK"
@@ -537,7 +1030,7 @@ def merge_with_png_base(base_path, extras, merged_path):
 		all_extra_payload = b""
 		for (extra_path, ext) in extras:
 			with open(extra_path, "rb") as ef:
-				all_extra_payload += b"\n--EMBED--" + os.path.basename(extra_path).encode("utf-8") + b"\n" + ef.read()
+				all_extra_payload += EMBED_MARKER + os.path.basename(extra_path).encode("utf-8") + b"\n" + ef.read()
 		new_png = insert_chunk_before_iend(png_blob, b"pLTg", all_extra_payload)
 		merged_bytes = ico_bytes[:png_idx] + new_png
 		with open(merged_path, "wb") as out:
@@ -571,13 +1064,30 @@ def merge_with_pdf_base(base_path, extras, merged_path):
 	except Exception as e:
 		return False, f"PDF embedding failed: {e}"
 
+def merge_with_raw_bytes(base_path, extras, merged_path):
+	"""
+	Merge extras into a base file by raw byte concatenation.
+	Args:
+		base_path (str): Base file path.
+		extras (list): List of tuples (filename_on_disk, mime_type/extension).
+		merged_path (str): Output path for the merged file.
+	"""
+	with open(base_path, "rb") as bf:
+		out_bytes = bf.read()
+	for p, ext in extras:
+		with open(p, "rb") as ef:
+			out_bytes += ef.read()
+	with open(merged_path, "wb") as out:
+		out.write(out_bytes)
+	return True, "Appended raw bytes (fallback)."
+
 # FIXME: Fix merging of image files to work with video files
 @app.route("/merge", methods=["POST"])
-def merge():
+async def merge():
 	"""
 	Merge multiple files into a single file based on their types.
 	"""
-	files = request.files.getlist("files")
+	files = (await request.files).getlist("files")
 	if not files or len(files) < 2:
 		return jsonify({"error": "At least two files are required for merging"}), 400
 
@@ -586,8 +1096,8 @@ def merge():
 	for f in files:
 		filename = secure_filename(f.filename)
 		ext = os.path.splitext(filename)[1].lower().lstrip(".")
-		save_path = os.path.join(UPLOAD_FOLDER, filename)
-		f.save(save_path)
+		save_key = os.path.join(UPLOAD_FOLDER, filename)
+		await asyncio.to_thread(storage.save, save_key, f.stream)
 
 		file_type = detect_type(ext)
 		target = None
@@ -601,13 +1111,13 @@ def merge():
 			target = "zip"
 
 		if target:
-			conv = convert_one({"filename": filename, "target_format": target})
+			conv = await convert_one({"filename": filename, "target_format": target})
 			if isinstance(conv, dict):
-				conv_path = os.path.join(UPLOAD_FOLDER, conv["filename"])
+				conv_path = await asyncio.to_thread(storage.local_path, os.path.join(UPLOAD_FOLDER, conv["filename"]))
 			else:
-				conv_path = os.path.join(CONVERTED_FOLDER, conv)
+				conv_path = await asyncio.to_thread(storage.local_path, os.path.join(CONVERTED_FOLDER, conv))
 		else:
-			conv_path = save_path
+			conv_path = await asyncio.to_thread(storage.local_path, save_key)
 		converted.append(conv_path)
 
 	# Choose base using priority (lowest number = highest priority)
@@ -616,53 +1126,356 @@ def merge():
 	extras = [(p, os.path.splitext(p)[1].lower().lstrip(".")) for p in converted[1:]]
 
 	outname = f"{uuid.uuid4().hex}_merged.polyglot"
-	outpath = os.path.join(CONVERTED_FOLDER, outname)
+	outkey = os.path.join(CONVERTED_FOLDER, outname)
+	outpath = storage.local_path(outkey, fetch=False)
 
 	base_ext = os.path.splitext(base)[1].lower().lstrip(".")
 
 	# Use strategy depending on base_ext
 	if base_ext == "mp4":
-		ok, msg = merge_with_mp4_base(base, extras, outpath)
+		ok, msg = await merge_with_mp4_base(base, extras, outpath)
 	elif base_ext == "ico":
-		ok, msg = merge_with_png_base(base, extras, outpath)
+		ok, msg = await asyncio.to_thread(merge_with_png_base, base, extras, outpath)
 	elif base_ext == "pdf":
-		ok, msg = merge_with_pdf_base(base, extras, outpath)
+		ok, msg = await asyncio.to_thread(merge_with_pdf_base, base, extras, outpath)
 	else:
 		# Fallback: append raw bytes with byte concatenation and try to verify via magic scanning
-		with open(base, "rb") as bf:
-			out_bytes = bf.read()
-		for p, ext in extras:
-			with open(p, "rb") as ef:
-				out_bytes += ef.read()
-		with open(outpath, "wb") as out:
-			out.write(out_bytes)
-		ok = True
-		msg = "Appended raw bytes (fallback)."
+		ok, msg = await asyncio.to_thread(merge_with_raw_bytes, base, extras, outpath)
 
 	if not ok:
 		return jsonify({"error": "merge failed", "detail": msg}), 500
+	await asyncio.to_thread(storage.commit, outkey)
 
-	return send_file(outpath, as_attachment=True, download_name=outname)
+	response = await send_download(outpath, download_name=outname, etag=storage.etag(outkey))
+	response.headers["Content-Location"] = url_for("download", filename=outname)
+	return response
+
+def sniff_ext(head):
+	"""
+	Guess a file extension from leading magic bytes.
+	Args:
+		head (bytes): Leading bytes of the file.
+	"""
+	if head.startswith(PNG_SIG):
+		return "png"
+	elif head.startswith(b"%PDF-"):
+		return "pdf"
+	elif head.startswith(b"PK\x03\x04"):
+		return "zip"
+	elif head.startswith(b"\x00\x00\x01\x00"):
+		return "ico"
+	elif head[4:8] == b"ftyp":
+		return "mp4"
+	return "bin"
+
+def iter_mp4_boxes(buf):
+	"""
+	Yield (box_type, start, data_start, end) for each top-level MP4 box.
+	Args:
+		buf (bytes|mmap.mmap): MP4 data.
+	"""
+	offset = 0
+	while offset + 8 <= len(buf):
+		size, box_type = struct.unpack_from(">I4s", buf, offset)
+		header_size = 8
+		if size == 1:
+			# 64-bit largesize follows the type
+			if offset + 16 > len(buf):
+				return
+			size = struct.unpack_from(">Q", buf, offset + 8)[0]
+			header_size = 16
+		elif size == 0:
+			# Box extends to the end of the file
+			size = len(buf) - offset
+		if box_type == b"uuid":
+			header_size += 16 # usertype(16)
+		if size < header_size or offset + size > len(buf):
+			return
+		yield box_type, offset, offset + header_size, offset + size
+		offset += size
+
+def iter_png_chunks(buf, start):
+	"""
+	Yield (chunk_type, start, data_start, data_end) for each PNG chunk, up to and including IEND.
+	Args:
+		buf (bytes|mmap.mmap): Data containing the PNG.
+		start (int): Offset of the PNG signature.
+	"""
+	offset = start + len(PNG_SIG)
+	while offset + 12 <= len(buf):
+		length, chunk_type = struct.unpack_from(">I4s", buf, offset)
+		end = offset + 12 + length # length(4) + type(4) + data + crc(4)
+		if end > len(buf):
+			return
+		yield chunk_type, offset, offset + 8, end - 4
+		if chunk_type == b"IEND":
+			return
+		offset = end
+
+def split_mp4_polyglot(buf):
+	"""
+	Split an MP4 polyglot into the base MP4 and the payloads of the trailing 'uuid' boxes appended by /merge.
+	Other 'uuid' boxes (e.g., PIFF or camera metadata after 'moov') have a different usertype and stay in the base.
+	Args:
+		buf (bytes|mmap.mmap): Polyglot data.
+	"""
+	boxes = list(iter_mp4_boxes(buf))
+	first_extra = len(boxes)
+	while first_extra > 0:
+		box_type, _, data_start, _ = boxes[first_extra - 1]
+		if box_type != b"uuid" or buf[data_start - 16:data_start] != EMBED_USERTYPE:
+			break
+		first_extra -= 1
+	if first_extra == len(boxes):
+		return []
+
+	parts = [("base.mp4", [(0, boxes[first_extra][1])])]
+	for _, _, data_start, end in boxes[first_extra:]:
+		parts.append((None, [(data_start, end)]))
+	return parts
+
+def split_png_polyglot(buf):
+	"""
+	Split a PNG (or ICO with an embedded PNG) polyglot into the base image and the extras of its pLTg chunk.
+	Args:
+		buf (bytes|mmap.mmap): Polyglot data.
+	"""
+	png_start = buf.find(PNG_SIG, 0)
+	if png_start == -1:
+		return []
+
+	for chunk_type, start, data_start, data_end in iter_png_chunks(buf, png_start):
+		if chunk_type != b"pLTg":
+			continue
+		# Base image is everything but the pLTg chunk
+		base_ext = "png" if png_start == 0 else "ico"
+		parts = [(f"base.{base_ext}", [(0, start), (data_end + 4, len(buf))])]
+		offset = buf.find(EMBED_MARKER, data_start, data_end)
+		while offset != -1:
+			name_start = offset + len(EMBED_MARKER)
+			name_end = buf.find(b"\n", name_start, data_end)
+			if name_end == -1:
+				break
+			next_offset = buf.find(EMBED_MARKER, name_end + 1, data_end)
+			name = secure_filename(buf[name_start:name_end].decode("utf-8", "replace"))
+			parts.append((name or None, [(name_end + 1, data_end if next_offset == -1 else next_offset)]))
+			offset = next_offset
+		# A pLTg chunk without extras embeds nothing
+		return parts if len(parts) > 1 else []
+	return []
+
+def strip_pdf_attachments(reader, buf, end):
+	"""
+	Build an incremental update that removes /EmbeddedFiles from the catalog's name dictionary.
+	Appended to the original bytes, it keeps every other object (outline, metadata, forms) as it was.
+	Args:
+		reader (pypdf.PdfReader): Reader over buf.
+		buf (mmap.mmap): Polyglot data.
+		end (int): Offset just past the last %%EOF of the PDF.
+	"""
+	from pypdf.generic import DictionaryObject, IndirectObject, NameObject, NumberObject
+
+	def copy_without(dictionary, key):
+		return DictionaryObject({NameObject(k): dictionary.raw_get(k) for k in dictionary if k != key})
+
+	root = reader.trailer.raw_get("/Root")
+	catalog = root.get_object()
+	names = catalog.raw_get("/Names")
+	if isinstance(names, IndirectObject):
+		# Only the name dictionary changes
+		ref, obj = names, copy_without(names.get_object(), "/EmbeddedFiles")
+	else:
+		ref, obj = root, copy_without(catalog, "/Names")
+		names = copy_without(names, "/EmbeddedFiles")
+		if names:
+			obj[NameObject("/Names")] = names
+
+	# The update's xref section chains to the last one of the original file
+	startxref = buf.rfind(b"startxref", 0, end)
+	fields = buf[startxref + len(b"startxref"):end].split() if startxref != -1 else []
+	if not fields or not fields[0].isdigit():
+		raise ValueError("Malformed PDF: startxref not found")
+	prev = int(fields[0])
+
+	update = io.BytesIO()
+	update.write(b"\n")
+	obj_offset = end + update.tell()
+	update.write(f"{ref.idnum} {ref.generation} obj\n".encode())
+	obj.write_to_stream(update)
+	update.write(b"\nendobj\n")
+	xref_offset = end + update.tell()
+	# Start with the head of the free list, as readers expect the table to begin at object 0
+	update.write(f"xref\n0 1\n0000000000 65535 f \n{ref.idnum} 1\n{obj_offset:010d} {ref.generation:05d} n \n".encode())
+	trailer = DictionaryObject({NameObject("/Size"): reader.trailer.raw_get("/Size"), NameObject("/Root"): root, NameObject("/Prev"): NumberObject(prev)})
+	for key in ("/Info", "/ID"):
+		if key in reader.trailer:
+			trailer[NameObject(key)] = reader.trailer.raw_get(key)
+	update.write(b"trailer\n")
+	trailer.write_to_stream(update)
+	update.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+	return update.getvalue()
+
+def split_pdf_polyglot(buf):
+	"""
+	Split a PDF polyglot into the base PDF and its attachments.
+	The base is the original bytes plus an incremental update dropping /EmbeddedFiles, and attachments are read when written.
+	Falls back to magic scanning when the PDF has no attachments.
+	Raises ValueError if the PDF cannot be parsed or is encrypted.
+	Args:
+		buf (mmap.mmap): Polyglot data (pypdf reads it as a seekable stream).
+	"""
+	from pypdf import PdfReader
+	from pypdf.errors import PdfReadError
+	try:
+		reader = PdfReader(buf)
+		if reader.is_encrypted:
+			raise ValueError("Encrypted PDFs are not supported")
+		embedded_files = list(reader.attachment_list)
+		if not embedded_files:
+			return split_raw_polyglot(buf)
+		region = find_pdf_region(buf)
+		if region is None:
+			raise ValueError("Malformed PDF: %%EOF not found")
+		_, end = region
+		update = strip_pdf_attachments(reader, buf, end)
+	except PdfReadError as e:
+		raise ValueError(f"Malformed PDF: {e}")
+
+	parts = [("base.pdf", [(0, end), update])]
+	for embedded in embedded_files:
+		parts.append((secure_filename(embedded.name) or None, [lambda embedded=embedded: embedded.content]))
+	return parts
+
+def split_raw_polyglot(buf):
+	"""
+	Find PDF and PNG regions in a polyglot made by raw byte concatenation.
+	Returns no parts unless a region starts after offset 0, since a lone region at the start is just the input file.
+	Args:
+		buf (bytes|mmap.mmap): Polyglot data.
+	"""
+	finders = [find_pdf_region]
+	# The PNG inside an ICO is the icon itself, not an embedded file
+	if sniff_ext(buf[:8]) != "ico":
+		finders.append(find_png_region)
+	regions = [region for region in (find_region(buf) for find_region in finders) if region]
+	if not any(start > 0 for start, _ in regions):
+		return []
+	return [(None, [region]) for region in regions]
+
+def split_polyglot(buf):
+	"""
+	Split a polyglot file into its parts based on its base format.
+	Each part is a tuple (name or None, segments), where segments are (start, end) offsets into buf, bytes, or callables returning bytes when the part is written.
+	Args:
+		buf (mmap.mmap): Polyglot data.
+	"""
+	if buf[4:8] == b"ftyp":
+		return split_mp4_polyglot(buf)
+	elif buf[:5] == b"%PDF-":
+		return split_pdf_polyglot(buf)
+	return split_png_polyglot(buf) or split_raw_polyglot(buf)
+
+def write_extracted_zip(zip_path, buf, parts, compression=None):
+	"""
+	Stream polyglot parts into a zip archive, copying them in chunks.
+	Args:
+		zip_path (str): Path to save the output zip file.
+		buf (mmap.mmap): Polyglot data the part offsets refer to.
+		parts (list): Parts as returned by split_polyglot().
+		compression (str, optional): Compression preset name. Defaults to UNICONVERTER_COMPRESSION.
+	"""
+	preset = get_compression_preset(compression)
+	with zipfile.ZipFile(zip_path, 'w', compression=preset["zip"], compresslevel=preset["level"]) as zipf:
+		for i, (name, segments) in enumerate(parts):
+			# Load lazy segments one part at a time
+			segments = [segment() if callable(segment) else segment for segment in segments]
+			first = segments[0]
+			head = first[:PROBE_SIZE] if isinstance(first, bytes) else buf[first[0]:min(first[0] + PROBE_SIZE, first[1])]
+			arcname = name or f"part_{i}.{sniff_ext(head)}"
+			# Opening by name applies the archive's compression and level; incompressible parts are stored
+			member = arcname
+			if not is_compressible(arcname, head):
+				member = zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+				member.compress_type = zipfile.ZIP_STORED
+
+			with zipf.open(member, 'w', force_zip64=True) as dst:
+				for segment in segments:
+					if isinstance(segment, bytes):
+						dst.write(segment)
+						continue
+					start, end = segment
+					for offset in range(start, end, EXTRACT_CHUNK_SIZE):
+						dst.write(buf[offset:min(offset + EXTRACT_CHUNK_SIZE, end)])
+
+def extract_polyglot(path, zip_path, compression=None):
+	"""
+	Split a polyglot file into its parts and write them to a zip archive.
+	Returns False if no embedded files were found.
+	Args:
+		path (str): Path to the polyglot file.
+		zip_path (str): Path to save the output zip file.
+		compression (str, optional): Compression preset name. Defaults to UNICONVERTER_COMPRESSION.
+	"""
+	# Memory-map the polyglot so only the pages being scanned or copied are resident
+	with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+		parts = split_polyglot(buf)
+		if not parts:
+			return False
+		write_extracted_zip(zip_path, buf, parts, compression)
+	return True
+
+@app.route("/extract", methods=["POST"])
+async def extract():
+	"""
+	Split a polyglot file (e.g., made by /merge) back into its parts and send them as a zip.
+	"""
+	file = (await request.files).get("file")
+	if not file or not secure_filename(file.filename):
+		return jsonify({"error": "No file uploaded"}), 400
+
+	key = os.path.join(UPLOAD_FOLDER, secure_filename(file.filename))
+	await asyncio.to_thread(storage.save, key, file.stream)
+	path = await asyncio.to_thread(storage.local_path, key)
+	if os.path.getsize(path) == 0:
+		return jsonify({"error": "File is empty"}), 400
+
+	outname = f"{uuid.uuid4().hex}_extracted.zip"
+	outkey = os.path.join(CONVERTED_FOLDER, outname)
+	outpath = storage.local_path(outkey, fetch=False)
+	try:
+		if not await asyncio.to_thread(extract_polyglot, path, outpath, (await request.form).get("compression")):
+			return jsonify({"error": "No embedded files found"}), 400
+	except ImportError as e:
+		print("PyPDF error: pypdf module not found")
+		print("Error details:", e)
+		return jsonify({"error": "pypdf is required for PDF extraction."}), 500
+	except ValueError as e:
+		return jsonify({"error": "Invalid polyglot file", "detail": str(e)}), 400
+	await asyncio.to_thread(storage.commit, outkey)
+
+	response = await send_download(outpath, download_name=outname, etag=storage.etag(outkey))
+	response.headers["Content-Location"] = url_for("download", filename=outname)
+	return response
 
 @app.route("/metadata", methods=["POST"])
-def get_metadata():
+async def get_metadata():
 	"""
 	Get metadata for a file using ExifTool.
 	Args:
 		filepath (str): Path to the file for which metadata is requested.
 	"""
-	data = request.get_json()
+	data = await request.get_json()
 	if not data or "filepath" not in data:
 		return jsonify({"error": "Missing \"filepath\" in JSON"}), 400
 
-	filepath = os.path.join(UPLOAD_FOLDER, secure_filename(data["filepath"]))
-	if not os.path.exists(filepath):
+	key = os.path.join(UPLOAD_FOLDER, secure_filename(data["filepath"]))
+	if not await asyncio.to_thread(storage.exists, key):
 		return jsonify({"error": "File does not exist"}), 404
+	filepath = await asyncio.to_thread(storage.local_path, key)
 
 	try:
-		result = subprocess.run(
+		result = await run_command(
 			["exiftool", "-j", filepath],
-			capture_output=True,
 			text=True,
 			check=True
 		)
@@ -675,58 +1488,69 @@ def get_metadata():
 		return jsonify({"error": "Failed to parse exiftool output"}), 500
 
 @app.route("/metadata/delete", methods=["POST"])
-def delete_metadata():
+async def delete_metadata():
 	"""
 	Delete metadata for a file using ExifTool.
 	Args:
 		filepath (str): Path to the file for which metadata is requested.
 	"""
-	data = request.get_json()
+	data = await request.get_json()
 	if not data or "filepath" not in data:
 		return jsonify({"error": "Missing \"filepath\" in JSON"}), 400
 
-	filepath = os.path.join(UPLOAD_FOLDER, secure_filename(data["filepath"]))
-	if not os.path.exists(filepath):
+	key = os.path.join(UPLOAD_FOLDER, secure_filename(data["filepath"]))
+	if not await asyncio.to_thread(storage.exists, key):
 		return jsonify({"error": "File does not exist"}), 404
+	filepath = await asyncio.to_thread(storage.local_path, key)
 
 	try:
-		result = subprocess.run(
+		result = await run_command(
 			["exiftool", "-all=", filepath],
-			capture_output=True,
 			text=True,
 			check=True
 		)
+		await asyncio.to_thread(storage.commit, key)
 		return jsonify({"success": True})
 
 	except subprocess.CalledProcessError as e:
 		return jsonify({"error": "Exiftool command failed", "details": e.stderr}), 500
 
+def resize_image(filepath, scale):
+	"""
+	Resize an image file in place with bicubic interpolation.
+	Args:
+		filepath (str): Path to the image file.
+		scale (float): Scale factor.
+	"""
+	import cv2
+	img = cv2.imread(filepath)
+	upscaled = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+	cv2.imwrite(filepath, upscaled)
+
 @app.route("/upscale", methods=["POST"])
-def upscale_image():
+async def upscale_image():
 	"""
 	Upscale images using OpenCV.
 	Args:
 		filepath (str): Path to the image file to upscale.
 		scale (int): Scale factor (must be between 1 and 4).
 	"""
-	data = request.get_json()
+	data = await request.get_json()
 	if not data or "filepath" not in data or "scale" not in data:
 		return jsonify({"error": "Missing parameters in JSON"}), 400
 
-	filepath = os.path.join(UPLOAD_FOLDER, secure_filename(data["filepath"]))
-	if not os.path.exists(filepath):
+	key = os.path.join(UPLOAD_FOLDER, secure_filename(data["filepath"]))
+	if not await asyncio.to_thread(storage.exists, key):
 		return jsonify({"error": "File does not exist"}), 404
+	filepath = await asyncio.to_thread(storage.local_path, key)
 
 	try:
-		import cv2
-
 		scale = float(data["scale"])
 		if not (1 <= scale <= 4):
 			return jsonify({"error": "Invalid scale value. Must be between 1 and 4."}), 400
-		img = cv2.imread(filepath)
-		upscaled = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-		cv2.imwrite(filepath, upscaled)
-		return send_file(filepath, as_attachment=False)
+		await asyncio.to_thread(resize_image, filepath, scale)
+		await asyncio.to_thread(storage.commit, key)
+		return await send_download(filepath, as_attachment=False, etag=storage.etag(key))
 	except Exception as e:
 		return jsonify({"error": "Upscale command failed", "details": str(e)}), 500
 
@@ -754,6 +1578,7 @@ def cleanup_files():
 	Cleanup uploaded and converted files.
 	"""
 	for folder in [UPLOAD_FOLDER, CONVERTED_FOLDER]:
+		folder = storage.local_path(folder, fetch=False)
 		for filename in os.listdir(folder):
 			file_path = os.path.join(folder, filename)
 			try:
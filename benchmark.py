@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+from app import run_command, transcode_audio
+
+def make_clip(path, seconds=1.0, rate=44100):
+	"""
+	Write a short stereo sine wave WAV clip.
+	Args:
+		path (str): Path to save the clip.
+		seconds (float, optional): Clip duration in seconds. Defaults to 1.0.
+		rate (int, optional): Sample rate. Defaults to 44100.
+	"""
+	import av
+	import numpy as np
+
+	t = np.arange(int(rate * seconds)) / rate
+	samples = (np.sin(2 * np.pi * 440 * t) * 10000).astype(np.int16)
+	with av.open(path, "w") as container:
+		stream = container.add_stream("pcm_s16le", rate=rate, layout="stereo")
+		frame = av.AudioFrame.from_ndarray(np.stack([samples, samples]).T.reshape(1, -1), format="s16", layout="stereo")
+		frame.sample_rate = rate
+		container.mux(stream.encode(frame))
+		container.mux(stream.encode(None))
+
+def bench(name, clips, out_dir, target_format, convert):
+	"""
+	Time converting every clip and print the throughput.
+	Args:
+		name (str): Label for the engine.
+		clips (list): Paths to the input clips.
+		out_dir (str): Folder for the converted files.
+		target_format (str): Target audio format.
+		convert (callable): Function taking (input_path, output_path).
+	"""
+	start = time.perf_counter()
+	for i, clip in enumerate(clips):
+		convert(clip, os.path.join(out_dir, f"{name}_{i}.{target_format}"))
+	elapsed = time.perf_counter() - start
+	print(f"{name:<12}{len(clips) / elapsed:>10.1f} files/s{elapsed:>10.2f} s")
+	return len(clips) / elapsed
+
+def ffmpeg_convert(input_path, output_path):
+	"""
+	Convert a clip with an ffmpeg subprocess, as convert_one() does for large files.
+	"""
+	out = asyncio.run(run_command(["ffmpeg", "-y", "-i", input_path, "-vn", output_path]))
+	if out.returncode != 0:
+		raise RuntimeError(out.stderr.decode("utf-8", "replace"))
+
+if __name__ == "__main__":
+	if "-h" in sys.argv or "--help" in sys.argv:
+		print(f"Usage: python {sys.argv[0]} [count] [target_format]")
+		print("\nBenchmark in-process (PyAV) against ffmpeg subprocess audio conversion on short clips.")
+		sys.exit(0)
+
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+	target_format = sys.argv[2] if len(sys.argv) > 2 else "mp3"
+
+	with tempfile.TemporaryDirectory() as temp_dir:
+		clips = []
+		for i in range(count):
+			clips.append(os.path.join(temp_dir, f"clip_{i}.wav"))
+			make_clip(clips[-1])
+
+		print(f"Converting {count} one-second WAV clips to {target_format}")
+		subprocess_rate = bench("ffmpeg", clips, temp_dir, target_format, ffmpeg_convert)
+		inprocess_rate = bench("in-process", clips, temp_dir, target_format, lambda i, o: transcode_audio(i, o, target_format))
+		print(f"Speedup: {inprocess_rate / subprocess_rate:.1f}x")
@@ -0,0 +1,14 @@
+import os
+
+# Bind to all interfaces on the default port
+bind = "0.0.0.0:5000"
+
+# One worker per available core (respects container CPU affinity limits)
+workers = int(os.environ.get("WEB_CONCURRENCY", len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()))
+
+# ASGI workers: each worker serves many requests on one event loop, awaiting external tools and handing
+# blocking work to a thread pool sized by UNICONVERTER_THREADS (see app.py)
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Conversions of large files can take a while
+timeout = int(os.environ.get("UNICONVERTER_TIMEOUT", 600))
@@ -0,0 +1,299 @@
+import os
+import shutil
+import tempfile
+import threading
+import contextlib
+import contextvars
+from collections import OrderedDict
+
+CHUNK_SIZE = 1024 * 1024 # Bytes copied at a time when streaming files
+
+# Cache paths handed out inside the current lease (shared by the request's tasks and worker threads)
+current_lease = contextvars.ContextVar("current_lease", default=None)
+
+class LocalStorage:
+	"""
+	Store files on the local filesystem (single node).
+	Keys are paths relative to the storage root (e.g., "uploads/image.png").
+	"""
+	def __init__(self, root="."):
+		"""
+		Args:
+			root (str, optional): Directory holding the stored files. Defaults to the working directory.
+		"""
+		self.root = root
+
+	def local_path(self, key, fetch=True):
+		"""
+		Get a local filesystem path for a key that can be read and written directly.
+		Args:
+			key (str): Storage key.
+			fetch (bool, optional): Ignored; local files never need fetching. Defaults to True.
+		"""
+		return os.path.join(self.root, key)
+
+	def exists(self, key):
+		"""
+		Check whether a key exists.
+		Args:
+			key (str): Storage key.
+		"""
+		return os.path.isfile(self.local_path(key))
+
+	def save(self, key, stream):
+		"""
+		Stream a file-like object into storage.
+		Args:
+			key (str): Storage key.
+			stream (file): Readable binary file-like object.
+		"""
+		with open(self.local_path(key), "wb") as f:
+			shutil.copyfileobj(stream, f, CHUNK_SIZE)
+
+	def commit(self, key):
+		"""
+		Publish a file written to local_path(key). Local files are already published.
+		Args:
+			key (str): Storage key.
+		"""
+		pass
+
+	def etag(self, key):
+		"""
+		Get the ETag to send for a key, or None to derive one from the local file.
+		Args:
+			key (str): Storage key.
+		"""
+		return None
+
+	def lease(self):
+		"""
+		Pin the files used inside the block. Local files are never evicted, so this does nothing.
+		"""
+		return contextlib.nullcontext()
+
+class S3Storage:
+	"""
+	Store files in an S3-compatible bucket (AWS S3, MinIO, ...) shared by all replicas.
+	Objects are read through a size-bounded LRU cache, and writes use multipart uploads.
+	Cached files in use by a lease are never evicted.
+	Credentials are taken from the standard AWS environment variables or config files.
+	"""
+	def __init__(self, bucket, endpoint_url=None, cache_dir=None, cache_size=1024 * 1024 * 1024, multipart_size=8 * 1024 * 1024):
+		"""
+		Args:
+			bucket (str): Bucket name.
+			endpoint_url (str, optional): Endpoint of an S3-compatible server (e.g., "http://minio:9000"). Defaults to AWS.
+			cache_dir (str, optional): Directory for the local read-through cache. Defaults to a temporary directory.
+			cache_size (int, optional): Maximum cache size in bytes. Defaults to 1 GiB.
+			multipart_size (int, optional): Threshold and part size for multipart uploads in bytes. Defaults to 8 MiB.
+		"""
+		import boto3
+		from boto3.s3.transfer import TransferConfig
+		from botocore.exceptions import ClientError
+
+		self.bucket = bucket
+		self.client = boto3.client("s3", endpoint_url=endpoint_url)
+		self.transfer_config = TransferConfig(multipart_threshold=multipart_size, multipart_chunksize=multipart_size)
+		self.ClientError = ClientError
+		self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "uniconverter-cache")
+		self.cache_size = cache_size
+		self.etags = {} # Key -> ETag of the cached copy
+		self.lock = threading.Lock()
+		self.cached = OrderedDict() # Cached path -> size, least recently used first
+		self.cached_bytes = 0
+		self.pins = {} # Cached path -> number of leases using it
+
+		# Index files left by a previous run once, oldest first, so they count towards the cache size
+		entries = []
+		for folder, _, filenames in os.walk(self.cache_dir):
+			for filename in filenames:
+				path = os.path.join(folder, filename)
+				stat = os.stat(path)
+				entries.append((stat.st_mtime, path, stat.st_size))
+		for _, path, size in sorted(entries):
+			self.track(path, size)
+
+	def head(self, key):
+		"""
+		Get object metadata for a key, or None if it does not exist.
+		Args:
+			key (str): Storage key.
+		"""
+		try:
+			return self.client.head_object(Bucket=self.bucket, Key=key)
+		except self.ClientError as e:
+			if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+				return None
+			raise
+
+	def local_path(self, key, fetch=True):
+		"""
+		Get a local cache path for a key, downloading the object if the cached copy is missing or stale.
+		Args:
+			key (str): Storage key.
+			fetch (bool, optional): Download the object into the cache. Defaults to True.
+		"""
+		path = os.path.join(self.cache_dir, key)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		self.pin(path)
+		if not fetch:
+			return path
+
+		head = self.head(key)
+		if head is None:
+			return path
+		if self.is_cached(key, path, head):
+			self.etags[key] = head["ETag"]
+			self.track(path)
+			return path
+
+		# Download next to the cached copy and swap it in atomically
+		fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+		try:
+			with os.fdopen(fd, "wb") as f:
+				self.client.download_fileobj(self.bucket, key, f, Config=self.transfer_config)
+			# Match the object's timestamp so every replica sends the same Last-Modified
+			os.utime(tmp_path, (head["LastModified"].timestamp(), head["LastModified"].timestamp()))
+			os.replace(tmp_path, path)
+		except Exception:
+			os.remove(tmp_path)
+			raise
+		self.etags[key] = head["ETag"]
+		self.track(path, os.path.getsize(path))
+		self.evict(keep=path)
+		return path
+
+	def exists(self, key):
+		"""
+		Check whether a key exists.
+		Args:
+			key (str): Storage key.
+		"""
+		return self.head(key) is not None
+
+	def is_cached(self, key, path, head):
+		"""
+		Check whether the cached copy of a key is the current object.
+		Copies from a previous run have no known ETag, so they are matched by the timestamp and size set when they were cached.
+		Args:
+			key (str): Storage key.
+			path (str): Cache path.
+			head (dict): Object metadata from head().
+		"""
+		try:
+			stat = os.stat(path)
+		except FileNotFoundError:
+			return False
+		if key in self.etags:
+			return self.etags[key] == head["ETag"]
+		return stat.st_mtime == head["LastModified"].timestamp() and stat.st_size == head["ContentLength"]
+
+	def save(self, key, stream):
+		"""
+		Stream a file-like object into the bucket using multipart uploads for large files.
+		Args:
+			key (str): Storage key.
+			stream (file): Readable binary file-like object.
+		"""
+		self.client.upload_fileobj(stream, self.bucket, key, Config=self.transfer_config)
+
+	def commit(self, key):
+		"""
+		Upload a file written to local_path(key, fetch=False) and keep it cached.
+		Args:
+			key (str): Storage key.
+		"""
+		path = self.local_path(key, fetch=False)
+		self.client.upload_file(path, self.bucket, key, Config=self.transfer_config)
+		head = self.head(key)
+		os.utime(path, (head["LastModified"].timestamp(), head["LastModified"].timestamp()))
+		self.etags[key] = head["ETag"]
+		self.track(path, os.path.getsize(path))
+		self.evict(keep=path)
+
+	def etag(self, key):
+		"""
+		Get the ETag to send for a key: the object's S3 ETag, which is the same on every replica.
+		Args:
+			key (str): Storage key.
+		"""
+		etag = self.etags.get(key)
+		return etag.strip('"') if etag else None
+
+	@contextlib.contextmanager
+	def lease(self):
+		"""
+		Pin every cache path handed out inside the block (including worker threads it starts), so eviction skips them until the block exits.
+		"""
+		paths = []
+		token = current_lease.set(paths)
+		try:
+			yield
+		finally:
+			current_lease.reset(token)
+			with self.lock:
+				for path in paths:
+					self.pins[path] -= 1
+					if not self.pins[path]:
+						del self.pins[path]
+
+	def pin(self, path):
+		"""
+		Pin a cache path for the current lease, if any.
+		Args:
+			path (str): Cache path.
+		"""
+		paths = current_lease.get()
+		if paths is None:
+			return
+		with self.lock:
+			self.pins[path] = self.pins.get(path, 0) + 1
+		paths.append(path)
+
+	def track(self, path, size=None):
+		"""
+		Mark a cache path as most recently used, recording its size if it was (re)written.
+		Args:
+			path (str): Cache path.
+			size (int, optional): New size of the file in bytes. Defaults to None (unchanged).
+		"""
+		with self.lock:
+			if size is not None:
+				self.cached_bytes += size - self.cached.get(path, 0)
+				self.cached[path] = size
+			if path in self.cached:
+				self.cached.move_to_end(path)
+
+	def evict(self, keep=None):
+		"""
+		Remove least recently used files from the cache until it fits in cache_size, skipping pinned files.
+		Args:
+			keep (str, optional): Path that must not be evicted (e.g., the file about to be used). Defaults to None.
+		"""
+		with self.lock:
+			for path, size in list(self.cached.items()):
+				if self.cached_bytes <= self.cache_size:
+					break
+				if path == keep or path in self.pins:
+					continue
+				try:
+					os.remove(path)
+				except FileNotFoundError:
+					pass
+				del self.cached[path]
+				self.cached_bytes -= size
+
+def get_storage():
+	"""
+	Create the storage backend selected by the UNICONVERTER_STORAGE environment variable ("local" or "s3").
+	"""
+	backend = os.environ.get("UNICONVERTER_STORAGE", "local").lower()
+	if backend == "s3":
+		return S3Storage(
+			os.environ["UNICONVERTER_S3_BUCKET"],
+			endpoint_url=os.environ.get("UNICONVERTER_S3_ENDPOINT"),
+			cache_dir=os.environ.get("UNICONVERTER_CACHE_DIR"),
+			cache_size=int(os.environ.get("UNICONVERTER_CACHE_SIZE", 1024 * 1024 * 1024))
+		)
+	return LocalStorage()
@@ -0,0 +1,57 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("quart")
+
+@pytest.fixture
+def uniconverter(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	import app
+	return app
+
+def make_members(tmp_path):
+	"""
+	Build a mix of compressible, incompressible, on-disk and in-memory members.
+	"""
+	text = tmp_path / "notes.txt"
+	text.write_bytes(b"hello zip\n" * 50000)
+	noise = tmp_path / "noise.bin"
+	noise.write_bytes(os.urandom(200000))
+	return [("notes.txt", str(text)), ("dir/nöise.bin", str(noise)), ("inline.txt", b"abc" * 10000), ("empty", b"")]
+
+def read_members(members):
+	return {arcname: source if isinstance(source, bytes) else open(source, "rb").read() for arcname, source in members}
+
+@pytest.mark.parametrize("compression", ["fast", "balanced", "max", "lzma"])
+def test_write_zip_round_trip(uniconverter, tmp_path, monkeypatch, compression):
+	monkeypatch.setattr(uniconverter, "ZIP_WORKERS", 3)
+	members = make_members(tmp_path) * 3
+	members = [(f"{i}/{arcname}", source) for i, (arcname, source) in enumerate(members)]
+	zip_path = tmp_path / "out.zip"
+	uniconverter.write_zip(str(zip_path), members, compression)
+
+	expected = read_members(members)
+	with zipfile.ZipFile(zip_path) as zipf:
+		assert zipf.testzip() is None
+		assert zipf.namelist() == [arcname for arcname, _ in members]
+		for info in zipf.infolist():
+			assert zipf.read(info) == expected[info.filename]
+			compressible = info.filename.endswith(".txt")
+			assert info.compress_type == (uniconverter.COMPRESSION_PRESETS[compression]["zip"] if compressible else zipfile.ZIP_STORED)
+
+def test_write_zip_zip64_records(uniconverter, tmp_path, monkeypatch):
+	# Lower the limit so every size and offset takes the ZIP64 path
+	monkeypatch.setattr(uniconverter, "ZIP64_LIMIT", 100)
+	members = make_members(tmp_path)
+	zip_path = tmp_path / "out.zip"
+	uniconverter.write_zip(str(zip_path), members)
+
+	expected = read_members(members)
+	with zipfile.ZipFile(zip_path) as zipf:
+		assert zipf.testzip() is None
+		assert {info.filename: zipf.read(info) for info in zipf.infolist()} == expected
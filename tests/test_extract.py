@@ -0,0 +1,139 @@
+import io
+import os
+import sys
+import struct
+import asyncio
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("quart")
+
+@pytest.fixture
+def uniconverter(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	import app
+	return app
+
+def make_extras(tmp_path):
+	"""
+	Write a compressible and an incompressible extra file.
+	"""
+	extras = {"notes.txt": b"hello polyglot\n" * 1000, "noise.bin": os.urandom(5000)}
+	for name, data in extras.items():
+		(tmp_path / name).write_bytes(data)
+	return extras
+
+def make_pdf():
+	"""
+	Build a small PDF with an outline and metadata.
+	"""
+	from pypdf import PdfWriter
+	writer = PdfWriter()
+	for _ in range(2):
+		writer.add_blank_page(100, 100)
+	writer.add_outline_item("Second page", 1)
+	writer.add_metadata({"/Title": "Base"})
+	buf = io.BytesIO()
+	writer.write(buf)
+	return buf.getvalue()
+
+def make_image(fmt):
+	"""
+	Build a small PNG or ICO image.
+	"""
+	from PIL import Image
+	buf = io.BytesIO()
+	Image.new("RGB", (16, 16), "red").save(buf, fmt)
+	return buf.getvalue()
+
+def make_mp4():
+	"""
+	Build a minimal MP4 ending with a foreign 'uuid' box (e.g., camera metadata).
+	"""
+	ftyp = struct.pack(">I4s4sI4s", 20, b"ftyp", b"isom", 0, b"isom")
+	moov = struct.pack(">I4s", 8, b"moov")
+	camera = struct.pack(">I4s", 28, b"uuid") + bytes(range(16)) + b"meta"
+	return ftyp + moov + camera
+
+def extract(uniconverter, tmp_path, name, data):
+	"""
+	Extract a polyglot file and return its parts by name.
+	"""
+	path = tmp_path / name
+	path.write_bytes(data)
+	zip_path = tmp_path / "extracted.zip"
+	assert uniconverter.extract_polyglot(str(path), str(zip_path))
+	with zipfile.ZipFile(zip_path) as zipf:
+		assert zipf.testzip() is None
+		return {info.filename: zipf.read(info) for info in zipf.infolist()}
+
+def test_extract_ico_round_trip(uniconverter, tmp_path):
+	extras = make_extras(tmp_path)
+	base = tmp_path / "base.ico"
+	base.write_bytes(make_image("ICO"))
+	merged = tmp_path / "merged.ico"
+	ok, _ = uniconverter.merge_with_png_base(str(base), [(str(tmp_path / name), None) for name in extras], str(merged))
+	assert ok
+
+	parts = extract(uniconverter, tmp_path, "merged.ico", merged.read_bytes())
+	assert parts == {"base.ico": base.read_bytes(), **extras}
+
+def test_extract_pdf_round_trip(uniconverter, tmp_path):
+	from pypdf import PdfReader
+	extras = make_extras(tmp_path)
+	base = tmp_path / "base.pdf"
+	base.write_bytes(make_pdf())
+	merged = tmp_path / "merged.pdf"
+	ok, _ = uniconverter.merge_with_pdf_base(str(base), [(str(tmp_path / name), None) for name in extras], str(merged))
+	assert ok
+
+	parts = extract(uniconverter, tmp_path, "merged.pdf", merged.read_bytes())
+	assert {name: parts[name] for name in extras} == extras
+
+	# The base keeps its pages, outline and metadata but no longer has attachments
+	reader = PdfReader(io.BytesIO(parts["base.pdf"]), strict=True)
+	assert len(reader.pages) == 2
+	assert [item.title for item in reader.outline] == ["Second page"]
+	assert reader.metadata.title == "Base"
+	assert not list(reader.attachment_list)
+
+def test_extract_mp4_round_trip(uniconverter, tmp_path):
+	extras = make_extras(tmp_path)
+	base = tmp_path / "base.mp4"
+	base.write_bytes(make_mp4())
+	merged = tmp_path / "merged.mp4"
+	uniconverter.append_mp4_extras(str(base), [(str(tmp_path / name), None) for name in extras], str(merged))
+
+	# The foreign 'uuid' box stays in the base
+	parts = extract(uniconverter, tmp_path, "merged.mp4", merged.read_bytes())
+	assert parts.pop("base.mp4") == base.read_bytes()
+	assert sorted(parts.values()) == sorted(extras.values())
+
+@pytest.mark.parametrize("name, data, error", [
+	("empty.pdf", b"", "File is empty"),
+	("broken.pdf", b"%PDF-1.4 garbage", "Invalid polyglot file"),
+	("plain.pdf", None, "No embedded files found"),
+	("plain.png", None, "No embedded files found"),
+	("plain.ico", None, "No embedded files found"),
+	("plain.mp4", None, "No embedded files found")
+])
+def test_extract_rejects_bad_input(uniconverter, tmp_path, monkeypatch, name, data, error):
+	from quart.datastructures import FileStorage
+	from storage import LocalStorage
+	# The app only creates its folders in the directory it was first imported from
+	monkeypatch.setattr(uniconverter, "storage", LocalStorage(str(tmp_path)))
+	for folder in (uniconverter.UPLOAD_FOLDER, uniconverter.CONVERTED_FOLDER):
+		(tmp_path / folder).mkdir()
+	if data is None:
+		data = {"pdf": make_pdf, "png": lambda: make_image("PNG"), "ico": lambda: make_image("ICO"), "mp4": make_mp4}[name.rsplit(".", 1)[1]]()
+
+	async def scenario():
+		client = uniconverter.app.test_client()
+		response = await client.post("/extract", files={"file": FileStorage(io.BytesIO(data), name)})
+		assert response.status_code == 400
+		assert (await response.get_json())["error"] == error
+
+	asyncio.run(scenario())
@@ -0,0 +1,122 @@
+import io
+import os
+import sys
+import asyncio
+import tarfile
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("quart")
+moto = pytest.importorskip("moto")
+
+BUCKET = "uniconverter-test"
+
+@pytest.fixture
+def replicas(tmp_path, monkeypatch):
+	"""
+	Two S3Storage replicas sharing a mocked bucket, each with its own cache folder.
+	"""
+	monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+	monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+	monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+	monkeypatch.chdir(tmp_path)
+	with moto.mock_aws():
+		import boto3
+		from storage import S3Storage
+		boto3.client("s3").create_bucket(Bucket=BUCKET)
+		yield [S3Storage(BUCKET, cache_dir=str(tmp_path / f"replica_{i}")) for i in range(2)]
+
+def make_zip():
+	"""
+	Build a small zip archive in memory.
+	"""
+	buf = io.BytesIO()
+	with zipfile.ZipFile(buf, 'w') as zipf:
+		zipf.writestr("notes.txt", "hello world\n" * 1000)
+	return buf.getvalue()
+
+def test_convert_on_one_replica_download_from_another(replicas, monkeypatch):
+	import app as uniconverter
+	from quart.datastructures import FileStorage
+
+	async def request(replica, method, path, **kwargs):
+		monkeypatch.setattr(uniconverter, "storage", replica)
+		client = uniconverter.app.test_client()
+		response = await client.open(path, method=method, **kwargs)
+		return response, await response.get_data()
+
+	async def scenario():
+		first, second = replicas
+
+		# Upload and convert on the first replica
+		response, converted = await request(first, "POST", "/convert", files={"files": FileStorage(io.BytesIO(make_zip()), "notes.zip")}, form={"target_format": "gz"})
+		assert response.status_code == 200
+		location = response.headers["Content-Location"]
+		etag = response.headers["ETag"]
+		with tarfile.open(fileobj=io.BytesIO(converted)) as tar:
+			assert tar.extractfile("./notes.txt").read() == b"hello world\n" * 1000
+
+		# The second replica serves the same bytes with the same ETag, on a cache miss and on a cache hit
+		for _ in range(2):
+			response, body = await request(second, "GET", location)
+			assert response.status_code == 200
+			assert response.headers["ETag"] == etag
+			assert body == converted
+
+		# Conditional and resumed downloads validate against the shared ETag
+		response, _ = await request(second, "GET", location, headers={"If-None-Match": etag})
+		assert response.status_code == 304
+		response, body = await request(first, "GET", location, headers={"Range": "bytes=10-19", "If-Range": etag})
+		assert response.status_code == 206
+		assert body == converted[10:20]
+		response, body = await request(second, "GET", location, headers={"Range": "bytes=10-19", "If-Range": '"stale"'})
+		assert response.status_code == 200
+		assert body == converted
+
+	asyncio.run(scenario())
+
+def test_eviction_skips_leased_files(replicas):
+	replica = replicas[0]
+	replica.cache_size = 10
+	for name in ("a", "b", "c"):
+		with open(replica.local_path(f"converted/{name}", fetch=False), "wb") as f:
+			f.write(b"x" * 8)
+		replica.commit(f"converted/{name}")
+
+	# Only the most recent file fits, so fetching the others evicts everything that is not in use
+	with replica.lease():
+		in_use = replica.local_path("converted/a")
+		with replica.lease():
+			other = replica.local_path("converted/b")
+		replica.local_path("converted/c")
+		assert os.path.exists(in_use)
+		assert not os.path.exists(other)
+	assert replica.cached_bytes == sum(replica.cached.values())
+	assert not replica.pins
+
+def test_restart_reuses_cached_files(replicas):
+	from storage import S3Storage
+	replica = replicas[0]
+	with open(replica.local_path("converted/a", fetch=False), "wb") as f:
+		f.write(b"first")
+	replica.commit("converted/a")
+
+	# A new process indexes the cache folder and serves the unchanged object without downloading it
+	restarted = S3Storage(BUCKET, cache_dir=replica.cache_dir)
+	downloads = []
+	download_fileobj = restarted.client.download_fileobj
+	restarted.client.download_fileobj = lambda *args, **kwargs: downloads.append(args[1]) or download_fileobj(*args, **kwargs)
+	path = restarted.local_path("converted/a")
+	assert downloads == []
+	assert restarted.etag("converted/a") == replica.etag("converted/a")
+
+	# An object changed by another replica while this one was down (no known ETag) is downloaded again
+	replicas[1].client.put_object(Bucket=BUCKET, Key="converted/a", Body=b"second version")
+	restarted.etags.clear()
+	restarted.local_path("converted/a")
+	assert downloads == ["converted/a"]
+	with open(path, "rb") as f:
+		assert f.read() == b"second version"